@@ -1,30 +1,39 @@
 from __future__ import annotations
 
-import os
-import shutil
 from pathlib import Path
 
 import pytest
+from kolo.db import setup_db
 
-from .helpers import wait_for_save_in_db
+from .helpers import ensure_read_index, wait_for_save_in_db
 
 
 class KoloStorage:
-    data_directory = Path(os.environ.get("KOLO_PATH", ".")) / ".kolo"
-    db_path = data_directory / "db.sqlite3"
+    def __init__(self, path: Path) -> None:
+        self.data_directory = path / ".kolo"
+        self.db_path = self.data_directory / "db.sqlite3"
 
 
 @pytest.fixture
-def kolo_storage():
-    storage = KoloStorage()
+def kolo_storage(tmp_path, monkeypatch):
+    """
+    Give each test its own .kolo directory
+
+    kolo reads KOLO_PATH whenever it sets up the database, so pointing it
+    at tmp_path keeps tests (and pytest-xdist workers) from sharing a
+    SQLite file. pytest prunes old tmp_path directories itself.
+
+    The database is created up front so the index iter_rows_from_db reads
+    through can be added to it.
+    """
+    monkeypatch.setenv("KOLO_PATH", str(tmp_path))
+    storage = KoloStorage(tmp_path)
+    setup_db()
+    ensure_read_index(storage.db_path)
 
     yield storage
 
     wait_for_save_in_db()
-    try:
-        shutil.rmtree(storage.data_directory)
-    except FileNotFoundError:
-        pass
 
 
 @pytest.fixture(autouse=True, scope="session")
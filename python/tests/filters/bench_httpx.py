@@ -0,0 +1,264 @@
+"""
+Overhead benchmarks for kolo.enable around httpx traffic
+
+These aren't collected by a normal pytest run. Run them explicitly:
+
+    pytest tests/filters/bench_httpx.py
+
+Nothing runs them in CI; they are a manual tool for comparing a change
+against an earlier run on the same machine.
+
+Each scenario runs without kolo and with kolo.enable using both the Python
+and the Rust profiler. Results are written as json to $KOLO_BENCHMARK_OUTPUT
+(default bench_httpx.json). If $KOLO_BENCHMARK_BASELINE points at the output
+of an earlier run on the same Python implementation, any scenario whose
+overhead ratio grew by more than $KOLO_BENCHMARK_TOLERANCE (default 0.25)
+fails.
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import os
+import platform
+import sqlite3
+import statistics
+import time
+from contextlib import nullcontext
+from pathlib import Path
+from typing import Any, Callable, Dict, List
+
+import httpx
+import pytest
+
+import kolo
+
+from .httpretty_responses import (
+    load_response,
+    register_github_api_user_response_httpx,
+)
+
+ITERATIONS = int(os.environ.get("KOLO_BENCHMARK_ITERATIONS", "50"))
+TOLERANCE = float(os.environ.get("KOLO_BENCHMARK_TOLERANCE", "0.25"))
+CONCURRENCY = 10
+URL = "https://api.github.com/users/wilhelmklopp"
+
+MODES: Dict[str, Dict[str, Any] | None] = {
+    "disabled": None,
+    "python": {"use_rust": False},
+    "rust": {"use_rust": True},
+}
+
+
+@pytest.fixture(scope="module")
+def benchmark_results():
+    results: Dict[str, Any] = {
+        "implementation": platform.python_implementation(),
+        "python_version": platform.python_version(),
+        "iterations": ITERATIONS,
+        "scenarios": {},
+    }
+
+    yield results
+
+    output = os.environ.get("KOLO_BENCHMARK_OUTPUT", "bench_httpx.json")
+    with open(output, "w") as f:
+        json.dump(results, f, indent=2, sort_keys=True)
+
+
+def load_baseline(implementation: str) -> Dict[str, Any]:
+    path = os.environ.get("KOLO_BENCHMARK_BASELINE")
+    if not path:
+        return {}
+    with open(path) as f:
+        baseline = json.load(f)
+    if baseline["implementation"] != implementation:
+        return {}
+    return baseline["scenarios"]
+
+
+def db_bytes(db_path: Path) -> int:
+    if not db_path.exists():
+        return 0
+    connection = sqlite3.connect(str(db_path))
+    try:
+        (size,) = connection.execute(
+            "select coalesce(sum(length(data)), 0) from invocations"
+        ).fetchone()
+    except sqlite3.OperationalError:
+        size = 0
+    connection.close()
+    return size
+
+
+def summarise(timings: List[float], requests: int) -> Dict[str, float]:
+    per_request = [timing / requests * 1000 for timing in timings]
+    quantiles = statistics.quantiles(per_request, n=100)
+    return {
+        "p50_ms": quantiles[49],
+        "p90_ms": quantiles[89],
+        "p99_ms": quantiles[98],
+    }
+
+
+def record(
+    results: Dict[str, Any],
+    scenario: str,
+    summaries: Dict[str, Dict[str, float]],
+) -> None:
+    disabled = summaries["disabled"]["p50_ms"]
+    for summary in summaries.values():
+        summary["overhead_ratio"] = summary["p50_ms"] / disabled
+    results["scenarios"][scenario] = summaries
+
+    baseline = load_baseline(results["implementation"]).get(scenario, {})
+    regressions = [
+        f"{mode}: {summary['overhead_ratio']:.2f}x"
+        f" (was {baseline[mode]['overhead_ratio']:.2f}x)"
+        for mode, summary in summaries.items()
+        if mode in baseline
+        and summary["overhead_ratio"]
+        > baseline[mode]["overhead_ratio"] * (1 + TOLERANCE)
+    ]
+    if regressions:
+        pytest.fail(f"{scenario} overhead regressed: {', '.join(regressions)}")
+
+
+def benchmark(
+    kolo_storage, call: Callable[[], None], requests: int = 1
+) -> Dict[str, Dict[str, float]]:
+    summaries = {}
+    for mode, config in MODES.items():
+        call()  # warm up
+        bytes_before = db_bytes(kolo_storage.db_path)
+        timings = []
+        for _ in range(ITERATIONS):
+            context = nullcontext() if config is None else kolo.enable(config=config)
+            start = time.perf_counter()
+            with context:
+                call()
+            timings.append(time.perf_counter() - start)
+        bytes_written = db_bytes(kolo_storage.db_path) - bytes_before
+
+        summary = summarise(timings, requests)
+        summary["db_bytes_per_request"] = bytes_written / (ITERATIONS * requests)
+        summaries[mode] = summary
+    return summaries
+
+
+@pytest.fixture
+def client():
+    """
+    Share one client across a scenario's requests
+
+    Building a Client creates an SSL context, which costs far more than a
+    mocked request and would hide the profiler's overhead.
+    """
+    with httpx.Client() as client:
+        yield client
+
+
+@pytest.fixture
+def event_loop_runner():
+    """Run coroutines on one event loop, so async scenarios can use benchmark"""
+    loop = asyncio.new_event_loop()
+    yield loop.run_until_complete
+    loop.close()
+
+
+def test_sync_get(kolo_storage, httpx_mock, benchmark_results, client):
+    register_github_api_user_response_httpx(httpx_mock)
+
+    def call():
+        client.get(URL)
+
+    record(benchmark_results, "sync_get", benchmark(kolo_storage, call))
+
+
+def test_streaming_response(kolo_storage, httpx_mock, benchmark_results, client):
+    register_github_api_user_response_httpx(httpx_mock)
+
+    def call():
+        with client.stream("GET", URL) as r:
+            r.read()
+
+    record(benchmark_results, "streaming_response", benchmark(kolo_storage, call))
+
+
+def test_binary_response(kolo_storage, httpx_mock, benchmark_results, client):
+    body = "utf-32 body".encode("utf-32") * 1024
+    httpx_mock.add_response("GET", url=URL, content=body)
+
+    def call():
+        client.get(URL)
+
+    record(benchmark_results, "binary_response", benchmark(kolo_storage, call))
+
+
+def test_concurrent_async_client(
+    kolo_storage, httpx_mock, benchmark_results, event_loop_runner
+):
+    register_github_api_user_response_httpx(httpx_mock)
+    async_client = httpx.AsyncClient()
+
+    async def gather():
+        await asyncio.gather(*(async_client.get(URL) for _ in range(CONCURRENCY)))
+
+    def call():
+        event_loop_runner(gather())
+
+    try:
+        summaries = benchmark(kolo_storage, call, requests=CONCURRENCY)
+    finally:
+        event_loop_runner(async_client.aclose())
+    record(benchmark_results, "concurrent_async_client", summaries)
+
+
+def test_concurrent_scaling(
+    kolo_storage, httpx_mock, benchmark_results, event_loop_runner
+):
+    """
+    Check the profiler's cost grows linearly with concurrent requests
+
+    The mocked responses don't sleep, so the timings are dominated by kolo.
+    Linear growth keeps the time per request flat (or falling, as fixed
+    costs are shared) from 50 to 400 concurrent requests. Quadratic growth
+    would make it eight times larger.
+    """
+    recorded = load_response("wilhelmklopp")
+    httpx_mock.add_callback(
+        lambda request: httpx.Response(
+            200, content=recorded.body, headers=recorded.headers
+        )
+    )
+    async_client = httpx.AsyncClient()
+
+    async def gather(count):
+        await asyncio.gather(*(async_client.get(f"{URL}?n={n}") for n in range(count)))
+
+    def per_request_ms(count, config):
+        timings = []
+        for _ in range(5):
+            start = time.perf_counter()
+            with kolo.enable(config=config):
+                event_loop_runner(gather(count))
+            timings.append(time.perf_counter() - start)
+        return statistics.median(timings) / count * 1000
+
+    scaling = {}
+    try:
+        event_loop_runner(gather(5))  # warm up
+        for mode, config in MODES.items():
+            if config is None:
+                continue
+            small, large = (per_request_ms(count, config) for count in (50, 400))
+            scaling[mode] = {
+                "per_request_ms_50": small,
+                "per_request_ms_400": large,
+                "growth": large / small,
+            }
+    finally:
+        event_loop_runner(async_client.aclose())
+
+    benchmark_results["scenarios"]["concurrent_scaling"] = scaling
+    assert all(summary["growth"] < 2 for summary in scaling.values()), scaling
@@ -1,73 +1,100 @@
 import asyncio
 import json
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, NamedTuple, Tuple
 
 import httpretty
 import httpx
 
 
+API_RESPONSES_DIRECTORY = Path(__file__).parent.parent / "api_responses"
+
+
+class RecordedResponse(NamedTuple):
+    body: bytes
+    headers: Tuple[Tuple[str, str], ...]
+
+
+@lru_cache(maxsize=None)
+def load_response_index() -> Dict[str, Dict[str, str]]:
+    with open(API_RESPONSES_DIRECTORY / "index.json") as index:
+        return json.load(index)
+
+
+@lru_cache(maxsize=None)
+def load_response(name: str) -> RecordedResponse:
+    """
+    Load a recorded response listed in api_responses/index.json
+
+    Each response is read the first time it is needed and kept for the rest
+    of the session, so registering mocks and serving mocked responses don't
+    repeat any file I/O or json parsing.
+    """
+    entry = load_response_index()[name]
+    body = (API_RESPONSES_DIRECTORY / entry["body"]).read_bytes()
+    with open(API_RESPONSES_DIRECTORY / entry["headers"]) as headers:
+        return RecordedResponse(body, tuple(json.load(headers).items()))
+
+
 def register_github_api_user_response() -> None:
-    with open("tests/api_responses/wilhelmklopp.json") as body:
-        with open("tests/api_responses/wilhelmklopp-headers.json") as headers:
-            httpretty.register_uri(
-                httpretty.GET,
-                "https://api.github.com/users/wilhelmklopp",
-                body=body.read(),
-                headers=json.load(headers),
-            )
+    response = load_response("wilhelmklopp")
+    httpretty.register_uri(
+        httpretty.GET,
+        "https://api.github.com/users/wilhelmklopp",
+        body=response.body,
+        headers=dict(response.headers),
+    )
 
 
 def register_github_api_invalid_response() -> None:
-    with open("tests/api_responses/wilhelmklopp-headers.json") as headers:
-        httpretty.register_uri(
-            httpretty.GET,
-            "https://api.github.com/invalid",
-            body=json.dumps(
-                {
-                    "message": "Not Found",
-                    "documentation_url": "https://docs.github.com/rest",
-                }
-            ),
-            headers=json.load(headers),
-            status=404,
-        )
+    httpretty.register_uri(
+        httpretty.GET,
+        "https://api.github.com/invalid",
+        body=json.dumps(
+            {
+                "message": "Not Found",
+                "documentation_url": "https://docs.github.com/rest",
+            }
+        ),
+        headers=dict(load_response("wilhelmklopp").headers),
+        status=404,
+    )
 
 
 def register_github_api_invalid_post_response() -> None:
-    with open("tests/api_responses/wilhelmklopp-headers.json") as headers:
-        httpretty.register_uri(
-            httpretty.POST,
-            "https://api.github.com/invalid",
-            body=json.dumps(
-                {
-                    "message": "Not Found",
-                    "documentation_url": "https://docs.github.com/rest",
-                }
-            ),
-            headers=json.load(headers),
-            status=404,
-        )
+    httpretty.register_uri(
+        httpretty.POST,
+        "https://api.github.com/invalid",
+        body=json.dumps(
+            {
+                "message": "Not Found",
+                "documentation_url": "https://docs.github.com/rest",
+            }
+        ),
+        headers=dict(load_response("wilhelmklopp").headers),
+        status=404,
+    )
 
 
 def register_github_api_user_response_httpx(httpx_mock):
-    with open("tests/api_responses/wilhelmklopp.json") as body:
-        with open("tests/api_responses/wilhelmklopp-headers.json") as headers:
-            httpx_mock.add_response(
-                method="GET",
-                url="https://api.github.com/users/wilhelmklopp",
-                json=json.load(body),
-                headers=json.load(headers),
-            )
+    response = load_response("wilhelmklopp")
+    httpx_mock.add_response(
+        method="GET",
+        url="https://api.github.com/users/wilhelmklopp",
+        content=response.body,
+        headers=response.headers,
+    )
 
 
 async def pause(request):
     await asyncio.sleep(0.01)
-    with open("tests/api_responses/wilhelmklopp.json") as body:
-        with open("tests/api_responses/wilhelmklopp-headers.json") as headers:
-            return httpx.Response(
-                status_code=200,
-                json=json.load(body),
-                headers=json.load(headers),
-            )
+    response = load_response("wilhelmklopp")
+    return httpx.Response(
+        status_code=200,
+        content=response.body,
+        headers=response.headers,
+    )
 
 
 def register_github_api_user_response_httpx_async(httpx_mock):
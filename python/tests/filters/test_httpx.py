@@ -1,4 +1,6 @@
+import asyncio
 import json
+import sqlite3
 import threading
 
 import httpx
@@ -12,7 +14,13 @@ from .httpretty_responses import (
     register_github_api_user_response_httpx,
     register_github_api_user_response_httpx_async,
 )
-from ..helpers import ExtractFrames, load_data_from_db
+from ..helpers import (
+    ExtractFrames,
+    diff_invocations,
+    encode_data,
+    load_data_from_db,
+    load_rows_from_db,
+)
 
 
 @pytest.mark.parametrize("use_rust", (False, True))
@@ -61,6 +69,45 @@ def test_get_sync(kolo_storage, use_rust, httpx_mock):
     assert api_response["url"] == url
 
 
+def test_get_sync_compressed_storage(kolo_storage, httpx_mock):
+    register_github_api_user_response_httpx(httpx_mock)
+
+    url = "https://api.github.com/users/wilhelmklopp"
+    with kolo.enable(config={"use_rust": False}):
+        httpx.get(url)
+
+    data, _id = load_data_from_db(kolo_storage.db_path)
+    encoded = encode_data(data)
+
+    connection = sqlite3.connect(str(kolo_storage.db_path))
+    (raw_data,) = connection.execute(
+        "select data from invocations where id = ?", (_id,)
+    ).fetchone()
+    with connection:
+        connection.execute(
+            "update invocations set data = ? where id = ?", (encoded, _id)
+        )
+    connection.close()
+
+    assert len(encoded) * 2 < len(raw_data.encode("utf-8"))
+    assert load_data_from_db(kolo_storage.db_path) == (data, _id)
+
+
+def test_get_sync_repeatable(kolo_storage, httpx_mock):
+    register_github_api_user_response_httpx(httpx_mock)
+
+    url = "https://api.github.com/users/wilhelmklopp"
+    for _ in range(2):
+        with kolo.enable(config={"use_rust": False}):
+            httpx.get(url)
+
+    (_data, trace_id), (_other_data, other_trace_id) = load_rows_from_db(
+        kolo_storage.db_path
+    )
+
+    assert diff_invocations(kolo_storage.db_path, trace_id, other_trace_id) == []
+
+
 @pytest.mark.parametrize("use_rust", (False, True))
 def test_get_streaming_response(kolo_storage, use_rust, httpx_mock):
     register_github_api_user_response_httpx(httpx_mock)
@@ -181,6 +228,42 @@ async def test_get_async(kolo_storage, use_rust, httpx_mock):
     assert api_request["frame_id"] != api_request_2["frame_id"]
 
 
+@pytest.mark.asyncio
+@pytest.mark.parametrize("use_rust", (False, True))
+async def test_get_async_concurrent(kolo_storage, use_rust, httpx_mock):
+    register_github_api_user_response_httpx_async(httpx_mock)
+
+    count = 50
+    urls = [f"https://api.github.com/users/wilhelmklopp?n={n}" for n in range(count)]
+    with kolo.enable(config={"use_rust": use_rust}):
+        async with httpx.AsyncClient() as client:
+            responses = await asyncio.gather(*(client.get(url) for url in urls))
+
+    assert [r.status_code for r in responses] == [200] * count
+
+    data, _id = load_data_from_db(kolo_storage.db_path)
+    frames = data["frames_of_interest"]
+    api_requests = {
+        frame["frame_id"]: frame
+        for frame in frames
+        if frame["type"] == "outbound_http_request"
+    }
+    api_responses = {
+        frame["frame_id"]: frame
+        for frame in frames
+        if frame["type"] == "outbound_http_response"
+    }
+
+    assert sorted(request["url"] for request in api_requests.values()) == sorted(urls)
+    assert api_responses.keys() == api_requests.keys()
+    for frame_id, api_response in api_responses.items():
+        api_request = api_requests[frame_id]
+        assert api_response["url"] == api_request["url"]
+        assert api_response["method_and_full_url"] == f"GET {api_request['url']}"
+        assert api_response["status_code"] == 200
+        assert api_response["timestamp"] >= api_request["timestamp"]
+
+
 def test_get_sync_coverage(kolo_storage, httpx_mock):
     register_github_api_user_response_httpx(httpx_mock)
     db_path = setup_db()
@@ -190,8 +273,7 @@ def test_get_sync_coverage(kolo_storage, httpx_mock):
     with ExtractFrames() as extract_frames:
         r = httpx.get(url)
 
-    for frame in extract_frames:
-        profiler(*frame)
+    extract_frames.replay(profiler)
     profiler.save_request_in_db()
 
     response_data = r.json()
@@ -243,8 +325,7 @@ def test_get_binary_response_coverage(kolo_storage, httpx_mock):
     with ExtractFrames() as extract_frames:
         httpx.get(url)
 
-    for frame in extract_frames:
-        profiler(*frame)
+    extract_frames.replay(profiler)
     profiler.save_request_in_db()
 
     data, _id = load_data_from_db(kolo_storage.db_path)
@@ -268,8 +349,7 @@ async def test_get_async_coverage(kolo_storage, httpx_mock):
             r = await client.get(url)
             await client.get(url)
 
-    for frame in extract_frames:
-        profiler(*frame)
+    extract_frames.replay(profiler)
     profiler.save_request_in_db()
 
     response_data = r.json()
@@ -0,0 +1,168 @@
+"""
+Run tests in forked children of one warmed-up interpreter
+
+Running each test in its own `pytest` process isolates crashes, but every
+process pays for interpreter start-up, pytest's plugin loading and test
+collection, and for importing kolo, Django and httpx again. This runner does
+that once and then forks a child per test, so a segfault still only takes
+down the test that caused it:
+
+    python -m tests.forkserver tests/filters/test_httpx.py::test_get_sync ...
+
+Arguments after `--` are passed on to pytest. With `--coverage`, the parent
+starts measuring before it warms up, each child inherits the running tracer
+and saves its own data file, and the parent combines them at the end.
+"""
+from __future__ import annotations
+
+import argparse
+import contextlib
+import faulthandler
+import importlib
+import io
+import os
+import signal
+import sys
+import tempfile
+import time
+import traceback
+from typing import TYPE_CHECKING, List
+
+if TYPE_CHECKING:
+    import coverage
+
+WARM_MODULES = (
+    "django",
+    "django.test",
+    "freezegun",
+    "httpx",
+    "kolo",
+    "kolo._kolo",
+    "kolo.middleware",
+    "kolo.profiler",
+    "pytest_asyncio",
+    "pytest_httpx",
+)
+
+
+def warm_up(nodeids: List[str], pytest_args: List[str]) -> None:
+    """
+    Do the expensive first-time work once, before forking
+
+    A collect-only pytest session loads the pytest11 entry-point plugins,
+    conftest.py files and the test modules (with their asserts rewritten),
+    so each child finds them already imported. WARM_MODULES covers imports
+    that only happen while a test runs.
+    """
+    import pytest
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        pytest.main(["--collect-only", "-q", *nodeids, *pytest_args])
+
+    for module in WARM_MODULES:
+        try:
+            importlib.import_module(module)
+        except ImportError:
+            pass
+
+
+def run_child(
+    nodeid: str,
+    pytest_args: List[str],
+    crash_log: int,
+    coverage_: coverage.Coverage | None,
+) -> int:
+    import pytest
+
+    faulthandler.enable(file=crash_log)
+    try:
+        # pytest's faulthandler plugin would send tracebacks to stderr
+        # instead of crash_log.
+        return pytest.main([nodeid, "-p", "no:faulthandler", *pytest_args])
+    finally:
+        if coverage_ is not None:
+            # Coverage notices the new pid and saves to a file of our own
+            coverage_.stop()
+            coverage_.save()
+
+
+def run_test(
+    nodeid: str, pytest_args: List[str], coverage_: coverage.Coverage | None
+) -> bool:
+    with tempfile.TemporaryFile() as crash_log:
+        sys.stdout.flush()
+        sys.stderr.flush()
+        start = time.perf_counter()
+        pid = os.fork()
+        if pid == 0:  # pragma: no cover
+            exit_code = 1
+            try:
+                exit_code = run_child(
+                    nodeid, pytest_args, crash_log.fileno(), coverage_
+                )
+            except BaseException:
+                traceback.print_exc()
+            finally:
+                sys.stdout.flush()
+                sys.stderr.flush()
+                os._exit(exit_code)
+
+        _pid, status = os.waitpid(pid, 0)
+        duration = time.perf_counter() - start
+
+        if os.WIFSIGNALED(status):
+            signal_name = signal.Signals(os.WTERMSIG(status)).name
+            # The child may have died part way through a line of output
+            print(f"\nCRASHED {nodeid} with {signal_name} ({duration:.2f}s)")
+            crash_log.seek(0)
+            sys.stdout.write(crash_log.read().decode(errors="replace"))
+            return False
+
+        exit_code = os.WEXITSTATUS(status)
+        outcome = "PASSED" if exit_code == 0 else "FAILED"
+        print(f"{outcome} {nodeid} ({duration:.2f}s)")
+        return exit_code == 0
+
+
+def main(argv: List[str] | None = None) -> int:
+    argv = sys.argv[1:] if argv is None else argv
+    pytest_args: List[str] = []
+    if "--" in argv:
+        index = argv.index("--")
+        argv, pytest_args = argv[:index], argv[index + 1 :]
+
+    parser = argparse.ArgumentParser(prog="python -m tests.forkserver")
+    parser.add_argument("nodeids", nargs="+", help="pytest node ids to run")
+    parser.add_argument(
+        "--coverage",
+        action="store_true",
+        help="measure coverage in the children and combine it afterwards",
+    )
+    args = parser.parse_args(argv)
+
+    coverage_ = None
+    if args.coverage:
+        import coverage
+
+        coverage_ = coverage.Coverage(data_suffix=True)
+        coverage_.start()
+
+    warm_up(args.nodeids, pytest_args)
+
+    results = [run_test(nodeid, pytest_args, coverage_) for nodeid in args.nodeids]
+
+    if coverage_ is not None:
+        # The children's data files already include the warm-up, which they
+        # inherited from us, so there's nothing of our own to save.
+        coverage_.stop()
+        combined = coverage.Coverage()
+        combined.combine()
+        combined.save()
+
+    failed = results.count(False)
+    print(f"{len(results) - failed} passed, {failed} failed or crashed")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
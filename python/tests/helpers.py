@@ -4,14 +4,27 @@ import json
 import os
 import pathlib
 import re
+import reprlib
 import sqlite3
 import sys
 import threading
 import types
+import zlib
+from array import array
 from datetime import datetime, timezone
-from typing import Any, Dict, List, Tuple, TYPE_CHECKING
-
-from kolo.db import setup_db
+from typing import (
+    Any,
+    Callable,
+    Collection,
+    Dict,
+    Iterator,
+    List,
+    Sequence,
+    Tuple,
+    TYPE_CHECKING,
+)
+
+from kolo.db import TraceNotFoundError, setup_db
 from kolo.profiler import KoloProfiler
 
 if TYPE_CHECKING:
@@ -25,6 +38,13 @@ def wait_for_save_in_db() -> None:
             thread.join()
 
 
+HELPERS_PATH = os.path.normpath("tests/helpers")
+# KoloProfiler returns immediately for these, so there's no need to keep them
+IGNORED_EVENTS = frozenset(("c_call", "c_return"))
+EVENTS = ("call", "return", "c_exception")
+EVENT_CODES = {event: code for code, event in enumerate(EVENTS)}
+
+
 class ExtractFrames:
     """
     Save the arguments passed to a sys.setprofile callback for testing
@@ -35,18 +55,44 @@ class ExtractFrames:
     for test code to process explicitly. By passing these arguments to the
     callback we want to test, we gain coverage reporting for the callback.
 
+    To cut per-event overhead, each distinct frame is stored once and events
+    refer to it by index. Event names are stored as single byte codes and
+    c_call/c_return events are dropped, since KoloProfiler ignores them
+    anyway. Every recorded frame is still kept alive until the
+    ExtractFrames instance is discarded, because KoloProfiler reads frame
+    locals while replaying, so memory still grows with the number of calls.
+
     https://github.com/nedbat/coveragepy/commit/9288ef767b461153c297f98e8d2989b796c41bba
     """
 
-    def __init__(self) -> None:
-        self.frames: List[Tuple[types.FrameType, str, object]] = []
+    __slots__ = ("frames", "frame_indices", "events", "args", "_frame_indices")
 
-    def __call__(self, frame: types.FrameType, event: str, arg: object) -> None:
+    def __init__(self) -> None:
+        self.frames: List[types.FrameType] = []
+        self.frame_indices = array("L")
+        self.events = array("B")
+        self.args: List[object] = []
+        # Keyed by id(frame), which is stable because self.frames keeps
+        # every frame alive.
+        self._frame_indices: Dict[int, int] = {}
+
+    def __call__(
+        self, frame: types.FrameType, event: str, arg: object
+    ) -> None:  # pragma: no cover
         # Skip recording frames for ExtractFrames.__exit__
-        if (
-            os.path.normpath("tests/helpers") not in frame.f_code.co_filename
-        ):  # pragma: no cover
-            self.frames.append((frame, event, arg))  # pragma: no cover
+        if event in IGNORED_EVENTS or HELPERS_PATH in frame.f_code.co_filename:
+            return
+
+        frame_id = id(frame)
+        try:
+            index = self._frame_indices[frame_id]
+        except KeyError:
+            index = self._frame_indices[frame_id] = len(self.frames)
+            self.frames.append(frame)
+
+        self.frame_indices.append(index)
+        self.events.append(EVENT_CODES[event])
+        self.args.append(arg)
 
     def __enter__(self):
         sys.setprofile(self)
@@ -55,8 +101,18 @@ class ExtractFrames:
     def __exit__(self, *exc):
         sys.setprofile(None)
 
-    def __iter__(self):
-        yield from self.frames
+    def __len__(self) -> int:
+        return len(self.events)
+
+    def __iter__(self) -> Iterator[Tuple[types.FrameType, str, object]]:
+        frames = self.frames
+        for index, event, arg in zip(self.frame_indices, self.events, self.args):
+            yield frames[index], EVENTS[event], arg
+
+    def replay(self, profiler: Callable[[types.FrameType, str, object], None]) -> None:
+        """Pass every saved event to profiler, in the order they were recorded"""
+        for frame, event, arg in self:
+            profiler(frame, event, arg)
 
 
 def profile_view(view, headers=None, config=None) -> "HttpResponse":
@@ -80,8 +136,7 @@ def profile_view(view, headers=None, config=None) -> "HttpResponse":
     with ExtractFrames() as extract_frames:
         response = view(request)
 
-    for frame in extract_frames:
-        profiler(*frame)
+    extract_frames.replay(profiler)
 
     profiler.save_request_in_db()
 
@@ -112,32 +167,148 @@ def profile_view_frozen_time(
 
     with freeze_time(time):
         now = datetime.now(timezone.utc)
-        for frame in extract_frames:
-            profiler(*frame)
+        extract_frames.replay(profiler)
 
     profiler.save_request_in_db()
 
     return response, now
 
 
+COMPRESSED_DATA_MARKER = b"kolo-zlib\x01"
+
+
+def _iter_frame_lists(data: Dict[str, Any]) -> Iterator[List[Dict[str, Any]]]:
+    yield data.get("frames_of_interest", [])
+    yield from data.get("frames", {}).values()
+
+
+def encode_data(data: Dict[str, Any]) -> bytes:
+    """
+    Encode invocation data in the compressed storage format
+
+    Header maps repeated across frames are stored once in "headers_table"
+    and each frame refers to its headers by index. The compact json is then
+    zlib compressed and prefixed with COMPRESSED_DATA_MARKER so readers can
+    tell it apart from plain json.
+
+    Raises ValueError if data already has a top level "headers_table" key,
+    since it couldn't be told apart from the shared table when decoding.
+    """
+    if "headers_table" in data:
+        raise ValueError('Cannot encode data with a top level "headers_table" key')
+
+    headers_table: List[Dict[str, str]] = []
+    header_indices: Dict[str, int] = {}
+
+    def compact(frame: Dict[str, Any]) -> Dict[str, Any]:
+        headers = frame.get("headers")
+        if not isinstance(headers, dict):
+            return frame
+        key = json.dumps(headers)
+        try:
+            index = header_indices[key]
+        except KeyError:
+            index = header_indices[key] = len(headers_table)
+            headers_table.append(headers)
+        return {**frame, "headers": index}
+
+    compact_data = dict(data)
+    if "frames_of_interest" in data:
+        compact_data["frames_of_interest"] = [
+            compact(frame) for frame in data["frames_of_interest"]
+        ]
+    if "frames" in data:
+        compact_data["frames"] = {
+            thread_id: [compact(frame) for frame in frames]
+            for thread_id, frames in data["frames"].items()
+        }
+    compact_data["headers_table"] = headers_table
+    json_data = json.dumps(compact_data, separators=(",", ":"))
+    return COMPRESSED_DATA_MARKER + zlib.compress(json_data.encode("utf-8"))
+
+
+def decode_data(raw_data: str | bytes) -> Dict[str, Any]:
+    """Decode the data column of an invocation, compressed or not"""
+    if not (
+        isinstance(raw_data, bytes) and raw_data.startswith(COMPRESSED_DATA_MARKER)
+    ):
+        return json.loads(raw_data)
+
+    data = json.loads(zlib.decompress(raw_data[len(COMPRESSED_DATA_MARKER) :]))
+    headers_table = data.pop("headers_table")
+    for frames in _iter_frame_lists(data):
+        for frame in frames:
+            if isinstance(frame.get("headers"), int):
+                frame["headers"] = dict(headers_table[frame["headers"]])
+    return data
+
+
 def load_data_from_db(db_path: pathlib.Path) -> Tuple[Dict[str, Any], str]:
     connection = sqlite3.connect(str(db_path))
     cursor = connection.execute(
-        "select id, data from invocations order by created_at desc"
+        "select id, data from invocations order by created_at desc limit 1"
     )
     id, raw_data = cursor.fetchone()
     connection.close()
-    return json.loads(raw_data), id
+    return decode_data(raw_data), id
 
 
-def load_rows_from_db(db_path: pathlib.Path) -> List[Tuple[Dict[str, Any], str]]:
+def ensure_read_index(db_path: pathlib.Path) -> None:
+    """Create the (created_at, id) index used by iter_rows_from_db"""
     connection = sqlite3.connect(str(db_path))
-    cursor = connection.execute(
-        "select id, data from invocations order by created_at desc"
-    )
-    rows = cursor.fetchall()
-    connection.close()
-    return [(json.loads(raw_data), id) for id, raw_data in reversed(rows)]
+    try:
+        connection.execute(
+            """
+            create index if not exists idx_invocations_created_at_id
+            on invocations (created_at, id)
+            """
+        )
+    finally:
+        connection.close()
+
+
+def iter_rows_from_db(
+    db_path: pathlib.Path,
+    where: str | None = None,
+    params: Sequence[Any] = (),
+    page_size: int = 100,
+) -> Iterator[Tuple[Dict[str, Any], str]]:
+    """
+    Yield (data, id) for each stored invocation, oldest first
+
+    Rows are fetched a page at a time with keyset pagination on
+    (created_at, id) and decoded one by one, so memory use doesn't depend
+    on the size of the database. `where` is an optional SQL condition on
+    the invocations table, with placeholders filled from `params`.
+
+    This only reads from the database. Call ensure_read_index first to
+    back the ordering with an index.
+    """
+    condition = f"and ({where})" if where else ""
+    query = f"""
+        select created_at, id, data from invocations
+        where (created_at, id) > (?, ?) {condition}
+        order by created_at, id
+        limit ?
+    """
+    connection = sqlite3.connect(str(db_path))
+    try:
+        last_key: Tuple[str, str] = ("", "")
+        while True:
+            rows = connection.execute(query, (*last_key, *params, page_size))
+            count = 0
+            for created_at, id, raw_data in rows:
+                count += 1
+                last_key = (created_at, id)
+                yield decode_data(raw_data), id
+            if count < page_size:
+                return
+    finally:
+        connection.close()
+
+
+def load_rows_from_db(db_path: pathlib.Path) -> List[Tuple[Dict[str, Any], str]]:
+    return list(iter_rows_from_db(db_path))
 
 
 def format_timestamp(timestamp: datetime) -> str:
@@ -163,10 +334,128 @@ class RegexString:
         return rf"RegexString(r'{self.regex.pattern}')"
 
 
+# Keys that differ between otherwise identical invocations
+VOLATILE_KEYS = frozenset(("call_frame_id", "frame_id", "timestamp", "trace_id"))
+
+_diff_repr = reprlib.Repr()
+_diff_repr.maxstring = 80
+_diff_repr.maxother = 80
+
+
+def find_differences(
+    actual: Any,
+    expected: Any,
+    path: str = "",
+    ignore: Collection[str] = (),
+    limit: int = 10,
+    exact: bool = False,
+) -> List[str]:
+    """
+    Find where `actual` fails to match `expected`
+
+    Dicts match when every key of `expected` is in `actual` with a matching
+    value, so `expected` may leave out keys at any depth. With `exact`,
+    keys only found in `actual` are reported as unexpected too, which makes
+    the comparison symmetric. Lists must have the same length and matching
+    items. Anything else is compared with ==, with `expected` on the left so
+    matchers like RegexString work.
+
+    Returns at most `limit` differences, each prefixed with its path, and
+    stops comparing as soon as that many have been found. Keys in `ignore`
+    are skipped at every depth.
+    """
+    differences: List[str] = []
+    _find_differences(actual, expected, path, ignore, limit, exact, differences)
+    return differences
+
+
+def _find_differences(
+    actual: Any,
+    expected: Any,
+    path: str,
+    ignore: Collection[str],
+    limit: int,
+    exact: bool,
+    differences: List[str],
+) -> None:
+    if isinstance(expected, dict) and isinstance(actual, dict):
+        for key, value in expected.items():
+            if len(differences) >= limit:
+                return
+            if key in ignore:
+                continue
+            key_path = f"{path}[{key!r}]"
+            if key not in actual:
+                differences.append(f"{key_path}: missing")
+            else:
+                _find_differences(
+                    actual[key], value, key_path, ignore, limit, exact, differences
+                )
+        if exact:
+            for key in actual:
+                if len(differences) >= limit:
+                    return
+                if key not in expected and key not in ignore:
+                    differences.append(f"{path}[{key!r}]: unexpected")
+    elif isinstance(expected, list) and isinstance(actual, list):
+        if len(actual) != len(expected):
+            differences.append(
+                f"{path or '<root>'}: {len(actual)} items, expected {len(expected)}"
+            )
+        for index, (actual_item, expected_item) in enumerate(zip(actual, expected)):
+            if len(differences) >= limit:
+                return
+            _find_differences(
+                actual_item,
+                expected_item,
+                f"{path}[{index}]",
+                ignore,
+                limit,
+                exact,
+                differences,
+            )
+    elif not expected == actual:
+        differences.append(
+            f"{path or '<root>'}: {_diff_repr.repr(actual)}"
+            f" != {_diff_repr.repr(expected)}"
+        )
+
+
 def assert_issuperset(big: Dict[Any, Any], small: Dict[Any, Any]) -> None:
-    from pprint import pprint
+    differences = find_differences(big, small)
+    assert not differences, "\n".join(differences)
+
 
-    print()
-    pprint(big)
-    pprint(small)
-    assert {**big, **small} == big
+def _load_invocation(db_path: pathlib.Path, trace_id: str) -> Dict[str, Any]:
+    for data, _trace_id in iter_rows_from_db(db_path, "id = ?", (trace_id,)):
+        return data
+    raise TraceNotFoundError(trace_id)
+
+
+def diff_invocations(
+    db_path: pathlib.Path,
+    trace_id: str,
+    other_trace_id: str,
+    ignore: Collection[str] = VOLATILE_KEYS,
+    limit: int = 10,
+) -> List[str]:
+    """
+    Compare the frames of two stored invocations
+
+    Each invocation is loaded and decoded in full, one at a time, and their
+    frames of interest are compared pairwise, ignoring VOLATILE_KEYS by
+    default. The comparison is exact, so a key that only one invocation has
+    is reported whichever order the ids are given in: as "missing" when only
+    `other_trace_id` has it and "unexpected" when only `trace_id` does.
+    Raises TraceNotFoundError if either id isn't in the database.
+    """
+    data = _load_invocation(db_path, trace_id)
+    other_data = _load_invocation(db_path, other_trace_id)
+    return find_differences(
+        data["frames_of_interest"],
+        other_data["frames_of_interest"],
+        "['frames_of_interest']",
+        ignore,
+        limit,
+        exact=True,
+    )
@@ -0,0 +1,59 @@
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+
+SMOKE_TESTS = """
+import os
+import signal
+
+
+def test_pass():
+    pass
+
+
+def test_fail():
+    assert 1 == 2
+
+
+def test_crash():
+    os.kill(os.getpid(), signal.SIGSEGV)
+"""
+
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="requires os.fork")
+def test_forkserver_reports_outcomes(tmp_path):
+    test_file = tmp_path / "test_smoke.py"
+    test_file.write_text(SMOKE_TESTS)
+
+    result = subprocess.run(
+        [
+            sys.executable,
+            "-m",
+            "tests.forkserver",
+            f"{test_file}::test_pass",
+            f"{test_file}::test_fail",
+            f"{test_file}::test_crash",
+            "--",
+            "-p",
+            "no:cacheprovider",
+        ],
+        cwd=Path(__file__).parent.parent,
+        capture_output=True,
+        text=True,
+    )
+    lines = result.stdout.splitlines()
+
+    assert result.returncode == 1
+    assert any(line.startswith(f"PASSED {test_file}::test_pass ") for line in lines)
+    assert any(line.startswith(f"FAILED {test_file}::test_fail ") for line in lines)
+    assert any(
+        line.startswith(f"CRASHED {test_file}::test_crash with SIGSEGV ")
+        for line in lines
+    )
+    assert "Fatal Python error: Segmentation fault" in result.stdout
+    assert 'test_smoke.py", line 15 in test_crash' in result.stdout
+    assert lines[-1] == "1 passed, 2 failed or crashed"
@@ -0,0 +1,206 @@
+import json
+import sqlite3
+import zlib
+from datetime import datetime
+
+import pytest
+
+from kolo.db import (
+    TraceNotFoundError,
+    create_invocations_table,
+    db_cursor,
+    save_invocation_in_sqlite,
+)
+
+from .helpers import (
+    COMPRESSED_DATA_MARKER,
+    RegexString,
+    decode_data,
+    diff_invocations,
+    encode_data,
+    find_differences,
+    iter_rows_from_db,
+)
+
+
+def test_find_differences_subset_matches():
+    actual = {"type": "frame", "path": "app/views.py:12", "extra": [1, 2]}
+
+    assert find_differences(actual, {"type": "frame"}) == []
+    assert find_differences(actual, {"path": RegexString(r"app/.*\.py:\d+")}) == []
+
+
+def test_find_differences_paths():
+    actual = {"frames": [{"type": "frame", "headers": {"host": "example.com"}}]}
+    expected = {"frames": [{"type": "frame", "headers": {"host": "github.com"}}]}
+
+    assert find_differences(actual, expected) == [
+        "['frames'][0]['headers']['host']: 'example.com' != 'github.com'"
+    ]
+    assert find_differences(1, 2) == ["<root>: 1 != 2"]
+
+
+def test_find_differences_regex_string():
+    expected = {"frame_id": RegexString(r"frm_[\w]{26}")}
+
+    assert find_differences({"frame_id": "trc_1"}, expected) == [
+        r"['frame_id']: 'trc_1' != RegexString(r'frm_[\w]{26}')"
+    ]
+
+
+def test_find_differences_missing_and_unexpected_keys():
+    actual = {"a": 1, "b": 2}
+
+    assert find_differences(actual, {"a": 1, "c": 3}) == ["['c']: missing"]
+    assert find_differences(actual, {"a": 1}) == []
+    assert find_differences(actual, {"a": 1}, exact=True) == ["['b']: unexpected"]
+    assert find_differences(actual, {"a": 1}, ignore={"b"}, exact=True) == []
+
+
+def test_find_differences_list_length():
+    assert find_differences({"x": [1, 2, 3]}, {"x": [1, 5]}) == [
+        "['x']: 3 items, expected 2",
+        "['x'][1]: 2 != 5",
+    ]
+
+
+def test_find_differences_limit():
+    actual = {"x": list(range(100))}
+    expected = {"x": [-1] * 100}
+
+    assert find_differences(actual, expected, limit=3) == [
+        "['x'][0]: 0 != -1",
+        "['x'][1]: 1 != -1",
+        "['x'][2]: 2 != -1",
+    ]
+
+
+def test_diff_invocations_is_symmetric(tmp_path):
+    db_path = tmp_path / "db.sqlite3"
+    with db_cursor(db_path) as cursor:
+        create_invocations_table(cursor)
+    frame = {"type": "frame", "frame_id": "frm_1", "event": "call"}
+    save_invocation_in_sqlite(
+        db_path, "trc_1", json.dumps({"frames_of_interest": [frame]})
+    )
+    save_invocation_in_sqlite(
+        db_path,
+        "trc_2",
+        json.dumps({"frames_of_interest": [{**frame, "frame_id": "frm_2", "x": 1}]}),
+    )
+
+    assert diff_invocations(db_path, "trc_1", "trc_2") == [
+        "['frames_of_interest'][0]['x']: missing"
+    ]
+    assert diff_invocations(db_path, "trc_2", "trc_1") == [
+        "['frames_of_interest'][0]['x']: unexpected"
+    ]
+
+
+def test_diff_invocations_unknown_trace(tmp_path):
+    db_path = tmp_path / "db.sqlite3"
+    with db_cursor(db_path) as cursor:
+        create_invocations_table(cursor)
+    save_invocation_in_sqlite(db_path, "trc_1", json.dumps({"frames_of_interest": []}))
+
+    with pytest.raises(TraceNotFoundError) as excinfo:
+        diff_invocations(db_path, "trc_1", "trc_missing")
+    assert excinfo.value.args == ("trc_missing",)
+
+    with pytest.raises(TraceNotFoundError):
+        diff_invocations(db_path, "trc_missing", "trc_1")
+
+
+def test_iter_rows_from_db_pagination(tmp_path):
+    db_path = tmp_path / "db.sqlite3"
+    with db_cursor(db_path) as cursor:
+        create_invocations_table(cursor)
+    earlier = datetime(2023, 7, 1, 12, 0, 0)
+    later = datetime(2023, 7, 1, 12, 0, 1)
+    # Rows sharing a created_at are ordered by id, whatever the insert order
+    for trace_id, created_at in (
+        ("trc_3", later),
+        ("trc_1", later),
+        ("trc_4", earlier),
+        ("trc_2", later),
+        ("trc_5", later),
+    ):
+        save_invocation_in_sqlite(
+            db_path,
+            trace_id,
+            json.dumps({"trace_id": trace_id, "even": trace_id[-1] in "24"}),
+            created_at=created_at,
+        )
+
+    expected = ["trc_4", "trc_1", "trc_2", "trc_3", "trc_5"]
+    for page_size in (1, 2, 100):
+        rows = list(iter_rows_from_db(db_path, page_size=page_size))
+        assert [id for _data, id in rows] == expected
+        assert [data["trace_id"] for data, _id in rows] == expected
+
+    for page_size in (1, 2):
+        rows = iter_rows_from_db(
+            db_path,
+            "json_extract(data, '$.even') = ?",
+            (True,),
+            page_size=page_size,
+        )
+        assert [id for _data, id in rows] == ["trc_4", "trc_2"]
+
+
+def test_kolo_storage_read_index(kolo_storage):
+    connection = sqlite3.connect(str(kolo_storage.db_path))
+    plan = connection.execute(
+        """
+        explain query plan
+        select created_at, id, data from invocations
+        where (created_at, id) > (?, ?)
+        order by created_at, id
+        limit ?
+        """,
+        ("", "", 1),
+    ).fetchall()
+    connection.close()
+
+    details = " ".join(row[-1] for row in plan)
+    assert "idx_invocations_created_at_id" in details
+    assert "TEMP B-TREE" not in details
+
+
+def test_encode_data_shares_headers():
+    headers = {"host": "api.github.com", "accept": "*/*"}
+    data = {
+        "trace_id": "trc_1",
+        "frames_of_interest": [
+            {"type": "outbound_http_request", "headers": headers},
+            {"type": "outbound_http_response", "headers": dict(headers)},
+        ],
+        "frames": {
+            "123": [
+                {"type": "outbound_http_request", "headers": dict(headers)},
+                {"type": "outbound_http_response", "headers": {"server": "x"}},
+            ]
+        },
+    }
+
+    encoded = encode_data(data)
+    compact = json.loads(zlib.decompress(encoded[len(COMPRESSED_DATA_MARKER) :]))
+    assert compact["headers_table"] == [headers, {"server": "x"}]
+    assert [frame["headers"] for frame in compact["frames_of_interest"]] == [0, 0]
+    assert [frame["headers"] for frame in compact["frames"]["123"]] == [0, 1]
+
+    decoded = decode_data(encoded)
+    assert decoded == data
+
+    decoded["frames_of_interest"][0]["headers"]["host"] = "example.com"
+    assert decoded["frames_of_interest"][1]["headers"] == headers
+    assert decoded["frames"]["123"][0]["headers"] == headers
+
+
+def test_encode_data_round_trip_without_frames():
+    assert decode_data(encode_data({"x": 1})) == {"x": 1}
+
+
+def test_encode_data_rejects_headers_table():
+    with pytest.raises(ValueError):
+        encode_data({"headers_table": []})